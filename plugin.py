@@ -18,7 +18,7 @@ import os
 import json
 import gradio as gr
 from shared.utils.plugins import WAN2GPPlugin
-from .utils import find_file_by_name
+from .utils import clear_find_cache, get_filename_index, set_default_search_dirs_provider, is_temp_path
 
 # List of image input keys to track and their required flags
 # Format: key -> (flag_source, required_flag)
@@ -36,77 +36,89 @@ IMAGE_ATTACHMENT_KEYS = {
 # Config key for storing custom search directories
 CONFIG_KEY_SEARCH_DIRS = "source_images_search_dirs"
 
+# Config key to resolve temp paths at save time (default) instead of when metadata is read
+CONFIG_KEY_EAGER_RESOLVE = "source_images_eager_resolve"
+
+# Config key to walk search dirs in parallel (unset = only when they span several drives)
+CONFIG_KEY_PARALLEL_SEARCH = "source_images_parallel_search"
+
 # Global reference to plugin instance for accessing server_config
 _plugin_instance = None
 
 
 def get_configured_output_dirs():
     """Get output directories from server_config and custom dirs if available."""
-    global _plugin_instance
+    if _plugin_instance is not None:
+        return _plugin_instance.get_configured_output_dirs()
+    return _collect_output_dirs(None)
+
+
+# Let utils readers (get_source_images_from_metadata, ...) search the configured dirs by default
+set_default_search_dirs_provider(get_configured_output_dirs)
+
+
+def _collect_output_dirs(config):
+    """
+    Build the list of candidate output directories for a server_config.
     
+    Directories are not checked for existence here (a drive may be plugged in
+    or a folder created later); the search walkers skip missing ones.
+    """
     search_dirs = []
 
     plugin_dir = os.path.dirname(os.path.abspath(__file__))
     root_dir = os.path.dirname(os.path.dirname(plugin_dir))
     
-    if _plugin_instance and hasattr(_plugin_instance, 'server_config') and _plugin_instance.server_config:
-        config = _plugin_instance.server_config
-        
+    if config:
         # Get all configured output paths
         for key in ['save_path', 'image_save_path', 'audio_save_path']:
             path = config.get(key)
-            if path and os.path.isdir(path) and path not in search_dirs:
+            if path and path not in search_dirs:
                 search_dirs.append(path)
         
         # Get custom search directories configured by user
         custom_dirs = config.get(CONFIG_KEY_SEARCH_DIRS, [])
         if isinstance(custom_dirs, list):
             for path in custom_dirs:
-                if path and os.path.isdir(path) and path not in search_dirs:
+                if path and path not in search_dirs:
                     search_dirs.append(path)
     
     # Add default outputs folder
     default_outputs = os.path.join(root_dir, 'outputs')
-    if os.path.isdir(default_outputs) and default_outputs not in search_dirs:
+    if default_outputs not in search_dirs:
         search_dirs.append(default_outputs)
     
     return search_dirs
 
 
-def resolve_and_build_info(path):
+def _is_temp_path(path):
+    """Check whether a path points into Gradio's temp upload folder."""
+    return is_temp_path(path)
+
+
+def build_info(path):
     """
-    Build info dict for a path, resolving temp paths to original files.
+    Build info dict for a path without touching the filesystem.
     
     Args:
         path: File path (may be temp or real)
         
     Returns:
-        Dict with path info, including resolved original_path if found
+        Dict with filename, is_temp flag and either original_path (real
+        paths) or temp_path (temp paths, not yet resolved)
     """
     if not path or not isinstance(path, str):
         return None
     
-    filename = os.path.basename(path)
-    is_temp = 'gradio' in path.lower() and ('temp' in path.lower() or 'appdata' in path.lower())
-    
+    is_temp = _is_temp_path(path)
     info = {
-        'filename': filename,
+        'filename': os.path.basename(path),
         'is_temp': is_temp,
     }
     
     if is_temp:
-        # Get configured output directories
-        search_dirs = get_configured_output_dirs()
-        
-        # Try to find the original file in output folders
-        original_path = find_file_by_name(filename, search_dirs=search_dirs)
-        if original_path:
-            info['original_path'] = original_path
-            print(f"[SourceImagesPlugin] Found original: {filename} -> {original_path}")
-        else:
-            # Store temp path as fallback (valid during session)
-            info['temp_path'] = path
-            print(f"[SourceImagesPlugin] No original found for {filename}, using temp path")
+        # Resolved later (or by the reader) by searching for the filename
+        info['temp_path'] = path
     else:
         # It's already a real path
         info['original_path'] = path
@@ -114,9 +126,68 @@ def resolve_and_build_info(path):
     return info
 
 
-def process_source_paths(source_paths, configs=None):
+def _get_output_index(search_dirs):
+    """Get the filename -> path index for the output folders (None skips the search)."""
+    if search_dirs is None:
+        return None
+    config = getattr(_plugin_instance, 'server_config', None) or {}
+    return get_filename_index(search_dirs, parallel=config.get(CONFIG_KEY_PARALLEL_SEARCH))
+
+
+def resolve_info(info, index):
     """
-    Process source paths to extract useful info and resolve originals.
+    Resolve a temp info dict to the original file in the output folders.
+    
+    Args:
+        info: Info dict from build_info (updated in place)
+        index: Dict mapping filenames to paths in the output folders,
+               or None to skip the search
+        
+    Returns:
+        The same info dict, with original_path set if found
+    """
+    if not info.get('is_temp') or 'original_path' in info:
+        return info
+    
+    filename = info['filename']
+    
+    # Try to find the original file in output folders
+    original_path = index.get(filename) if index is not None else None
+    if original_path:
+        info['original_path'] = original_path
+        info.pop('temp_path', None)
+        print(f"[SourceImagesPlugin] Found original: {filename} -> {original_path}")
+    else:
+        # Keep temp path as fallback (valid during session)
+        print(f"[SourceImagesPlugin] No original found for {filename}, using temp path")
+    
+    return info
+
+
+def resolve_and_build_info(path, search_dirs=None):
+    """
+    Build info dict for a path, resolving temp paths to original files.
+    
+    Args:
+        path: File path (may be temp or real)
+        search_dirs: Output directories to search for the original file.
+                     If None, the configured output directories are used.
+        
+    Returns:
+        Dict with path info, including resolved original_path if found
+    """
+    info = build_info(path)
+    if info:
+        if info['is_temp']:
+            if search_dirs is None:
+                search_dirs = get_configured_output_dirs()
+            resolve_info(info, _get_output_index(search_dirs))
+    return info
+
+
+def build_light_info(source_paths, configs=None):
+    """
+    Build path info for each used source image without resolving temp paths.
     
     Args:
         source_paths: Dict mapping image keys to file paths
@@ -129,6 +200,13 @@ def process_source_paths(source_paths, configs=None):
         return None
     
     result = {}
+    # Same path used in several slots (e.g. image_start == image_refs[0]) shares one info
+    memo = {}
+    
+    def _info_for(p):
+        if p not in memo:
+            memo[p] = build_info(p)
+        return memo[p]
     
     for key, value in source_paths.items():
         if value is None:
@@ -143,20 +221,70 @@ def process_source_paths(source_paths, configs=None):
         if isinstance(value, list):
             info_list = []
             for p in value:
-                info = resolve_and_build_info(p)
+                info = _info_for(p) if isinstance(p, str) else None
                 if info:
                     info_list.append(info)
             if info_list:
                 result[key] = info_list if len(info_list) > 1 else info_list[0]
         # Handle single path
         elif isinstance(value, str):
-            info = resolve_and_build_info(value)
+            info = _info_for(value)
             if info:
                 result[key] = info
     
     return result if result else None
 
 
+def resolve_light_info(light_info, search_dirs=None):
+    """
+    Resolve temp paths in path info built by build_light_info.
+    
+    Args:
+        light_info: Dict mapping image keys to info dicts (updated in place)
+        search_dirs: Output directories to search. Looked up once if None.
+        
+    Returns:
+        The same dict, with original paths resolved where found
+    """
+    if not light_info:
+        return light_info
+    
+    # Collect unique info dicts (repeated paths share one dict)
+    infos = {}
+    for value in light_info.values():
+        for info in (value if isinstance(value, list) else [value]):
+            infos[id(info)] = info
+    
+    # Look up the output directories once, and only if a temp path needs resolving
+    pending = [info for info in infos.values() if info.get('is_temp') and 'original_path' not in info]
+    if not pending:
+        return light_info
+    if search_dirs is None:
+        search_dirs = get_configured_output_dirs()
+    
+    # Walk the output folders once and reuse the index for every image
+    index = _get_output_index(search_dirs)
+    for info in pending:
+        resolve_info(info, index)
+    
+    return light_info
+
+
+def process_source_paths(source_paths, configs=None, search_dirs=None):
+    """
+    Process source paths to extract useful info and resolve originals.
+    
+    Args:
+        source_paths: Dict mapping image keys to file paths
+        configs: Settings dict to check which inputs are actually used
+        search_dirs: Output directories to search. Looked up once if None.
+        
+    Returns:
+        Dict with path info for each source image that is actually used
+    """
+    return resolve_light_info(build_light_info(source_paths, configs), search_dirs)
+
+
 def should_include_source_key(key, configs):
     """
     Check if a source image key should be included based on the model settings.
@@ -200,10 +328,13 @@ def before_metadata_save_hook(configs, plugin_data=None, model_type=None, **kwar
     """
     Hook called before metadata is saved to output files.
     
-    Adds 'source_images' key containing info about all input images used,
-    with resolved original paths when possible. Only includes images that
-    are actually used according to the current settings (image_prompt_type,
-    video_prompt_type).
+    Adds 'source_images' key containing info about all input images used.
+    Only includes images that are actually used according to the current
+    settings (image_prompt_type, video_prompt_type).
+    
+    Temp paths are resolved to original files right away so readers can use
+    'original_path' directly. With eager resolution disabled in server_config,
+    they are stored as-is (filename + temp path) and resolved when read.
     """
     if configs is None:
         return configs
@@ -211,8 +342,13 @@ def before_metadata_save_hook(configs, plugin_data=None, model_type=None, **kwar
     # Get source image paths from plugin_data (captured before validate_settings)
     source_paths = plugin_data.get('source_image_paths', {}) if plugin_data else {}
     
-    # Process paths and resolve originals, filtering by what's actually used
-    source_info = process_source_paths(source_paths, configs)
+    # Build path info, filtering by what's actually used
+    source_info = build_light_info(source_paths, configs)
+    
+    # Search the output folders for originals right away unless disabled
+    config = getattr(_plugin_instance, 'server_config', None) or {}
+    if source_info and config.get(CONFIG_KEY_EAGER_RESOLVE, True):
+        resolve_light_info(source_info)
     
     if source_info:
         configs['source_images'] = source_info
@@ -232,6 +368,13 @@ class SourceImagesPlugin(WAN2GPPlugin):
         self.request_global("server_config")
         self.request_global("server_config_filename")
         
+        # Cached search directories, rebuilt when the config file changes
+        self._cached_dirs = None
+        self._cached_dirs_mtime = 0
+        
+        # Last rendered dirs HTML, reused when add/remove changes nothing
+        self._rendered_html = None
+        
         # Store instance for global access
         global _plugin_instance
         _plugin_instance = self
@@ -344,6 +487,25 @@ class SourceImagesPlugin(WAN2GPPlugin):
         
         return config_blocks
     
+    def _config_mtime(self):
+        """Get the modification time of the server config file (0 if unknown)."""
+        config_filename = getattr(self, 'server_config_filename', None)
+        if config_filename:
+            try:
+                return os.stat(config_filename).st_mtime
+            except OSError:
+                pass
+        return 0
+    
+    def get_configured_output_dirs(self):
+        """Get output directories, reusing the cached list until the config file changes."""
+        mtime = self._config_mtime()
+        if self._cached_dirs is None or mtime != self._cached_dirs_mtime:
+            self._cached_dirs = _collect_output_dirs(getattr(self, 'server_config', None))
+            self._cached_dirs_mtime = mtime
+        
+        return self._cached_dirs
+    
     def _get_custom_dirs(self):
         """Get list of custom search directories from config."""
         if self.server_config:
@@ -359,22 +521,31 @@ class SourceImagesPlugin(WAN2GPPlugin):
         """Save custom directories to server_config."""
         if self.server_config and self.server_config_filename:
             self.server_config[CONFIG_KEY_SEARCH_DIRS] = dirs
+            self._cached_dirs = None
+            tmp_filename = self.server_config_filename + ".tmp"
             try:
-                with open(self.server_config_filename, "w", encoding="utf-8") as writer:
+                # Same format as WanGP; written to a temp file and swapped in so the
+                # config is never left half-written
+                with open(tmp_filename, "w", encoding="utf-8") as writer:
                     writer.write(json.dumps(self.server_config, indent=4))
+                os.replace(tmp_filename, self.server_config_filename)
             except Exception as e:
                 print(f"[SourceImagesPlugin] Error saving config: {e}")
+                try:
+                    os.remove(tmp_filename)
+                except OSError:
+                    pass
     
     def _render_dirs_list(self):
         """Render HTML for the directories list."""
-        html = '<div class="search-dirs-list">'
+        parts = ['<div class="search-dirs-list">']
         
         # Auto-detected directories
         auto_dirs = []
         if self.server_config:
             for key in ['save_path', 'image_save_path', 'audio_save_path']:
                 path = self.server_config.get(key)
-                if path and os.path.isdir(path) and path not in auto_dirs:
+                if path and all(d[0] != path for d in auto_dirs) and os.path.isdir(path):
                     auto_dirs.append((path, key))
         
         # Default outputs
@@ -387,34 +558,41 @@ class SourceImagesPlugin(WAN2GPPlugin):
                 auto_dirs.append((default_outputs, 'default'))
         
         if auto_dirs:
-            html += '<div style="margin-bottom: 10px; font-weight: bold; color: var(--body-text-color-subdued);">Auto-detected directories:</div>'
+            parts.append('<div style="margin-bottom: 10px; font-weight: bold; color: var(--body-text-color-subdued);">Auto-detected directories:</div>')
             for path, source in auto_dirs:
-                html += f'''
+                parts.append(f'''
                 <div class="dir-item auto">
                     <span class="dir-path">{path}</span>
                     <span class="dir-tag auto">{source}</span>
                 </div>
-                '''
+                ''')
         
         # Custom directories
         custom_dirs = self._get_custom_dirs()
         if custom_dirs:
-            html += '<div style="margin: 15px 0 10px 0; font-weight: bold; color: var(--body-text-color-subdued);">Custom directories:</div>'
+            parts.append('<div style="margin: 15px 0 10px 0; font-weight: bold; color: var(--body-text-color-subdued);">Custom directories:</div>')
             for path in custom_dirs:
                 exists = os.path.isdir(path)
                 status = "✓" if exists else "⚠️ Not found"
-                html += f'''
+                parts.append(f'''
                 <div class="dir-item">
                     <span class="dir-path">{path} {'' if exists else '<span style="color: orange;">(' + status + ')</span>'}</span>
                     <span class="dir-tag custom">custom</span>
                 </div>
-                '''
+                ''')
         
         if not auto_dirs and not custom_dirs:
-            html += '<div style="color: var(--body-text-color-subdued); text-align: center; padding: 20px;">No directories configured</div>'
+            parts.append('<div style="color: var(--body-text-color-subdued); text-align: center; padding: 20px;">No directories configured</div>')
         
-        html += '</div>'
-        return html
+        parts.append('</div>')
+        self._rendered_html = "".join(parts)
+        return self._rendered_html
+    
+    def _get_rendered_dirs_list(self):
+        """Return the last rendered dirs HTML, rendering it if needed."""
+        if self._rendered_html is None:
+            return self._render_dirs_list()
+        return self._rendered_html
     
     def _add_directory(self, new_dir):
         """Add a new custom directory."""
@@ -422,23 +600,24 @@ class SourceImagesPlugin(WAN2GPPlugin):
         
         if not new_dir:
             gr.Warning("Please enter a directory path.")
-            return self._render_dirs_list(), "", self._get_custom_dirs_choices()
+            return self._get_rendered_dirs_list(), "", self._get_custom_dirs_choices()
         
         # Normalize path
         new_dir = os.path.abspath(new_dir)
         
         if not os.path.isdir(new_dir):
             gr.Warning(f"Directory does not exist: {new_dir}")
-            return self._render_dirs_list(), new_dir, self._get_custom_dirs_choices()
+            return self._get_rendered_dirs_list(), new_dir, self._get_custom_dirs_choices()
         
         custom_dirs = self._get_custom_dirs()
         
         if new_dir in custom_dirs:
             gr.Info("Directory already in the list.")
-            return self._render_dirs_list(), "", self._get_custom_dirs_choices()
+            return self._get_rendered_dirs_list(), "", self._get_custom_dirs_choices()
         
         custom_dirs.append(new_dir)
         self._save_custom_dirs(custom_dirs)
+        clear_find_cache()
         
         gr.Info(f"Added directory: {new_dir}")
         return self._render_dirs_list(), "", self._get_custom_dirs_choices()
@@ -447,14 +626,17 @@ class SourceImagesPlugin(WAN2GPPlugin):
         """Remove a custom directory."""
         if not dir_to_remove:
             gr.Warning("Please select a directory to remove.")
-            return self._render_dirs_list(), self._get_custom_dirs_choices()
+            return self._get_rendered_dirs_list(), self._get_custom_dirs_choices()
         
         custom_dirs = self._get_custom_dirs()
         
-        if dir_to_remove in custom_dirs:
-            custom_dirs.remove(dir_to_remove)
-            self._save_custom_dirs(custom_dirs)
-            gr.Info(f"Removed directory: {dir_to_remove}")
+        if dir_to_remove not in custom_dirs:
+            return self._get_rendered_dirs_list(), gr.Dropdown(choices=self._get_custom_dirs_choices(), value=None)
+        
+        custom_dirs.remove(dir_to_remove)
+        self._save_custom_dirs(custom_dirs)
+        clear_find_cache()
+        gr.Info(f"Removed directory: {dir_to_remove}")
         
         return self._render_dirs_list(), gr.Dropdown(choices=self._get_custom_dirs_choices(), value=None)
 
@@ -11,11 +11,359 @@ original in the outputs folder.
 """
 
 import os
-import glob
-from typing import Optional, Dict, Any, List, Union
+import re
+import stat
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Dict, Any, List, Union, Tuple
 
 
-def find_file_by_name(filename: str, search_dirs: List[str] = None, recursive: bool = True) -> Optional[str]:
+# PIL.Image module, imported on first use by load_source_image
+_PIL_Image = None
+
+# Matches Gradio temp upload paths ('gradio' plus 'temp' or 'appdata', in either order)
+_TEMP_RE = re.compile(r'gradio.*(?:temp|appdata)|(?:temp|appdata).*gradio', re.IGNORECASE)
+
+# LRU cache of find_file_by_name results: (filename, search_dirs, ...options) -> (result, timestamp)
+_find_cache: "OrderedDict[tuple, Tuple[Optional[str], float]]" = OrderedDict()
+_FIND_CACHE_MAX = 512
+# LRU cache of filename indexes: (search_dirs, max_depth) -> (index, timestamp)
+_index_cache: "OrderedDict[tuple, Tuple[Dict[str, str], float]]" = OrderedDict()
+_INDEX_CACHE_MAX = 4
+_CACHE_TTL = 5.0
+# Guards both caches (metadata save and gallery readers can run on different threads)
+_cache_lock = threading.Lock()
+
+# Default cap on directory depth below each search dir (covers outputs/<model>/<date>/...)
+DEFAULT_MAX_DEPTH = 6
+# Roots already reported as hitting the depth cap (warn once per root)
+_depth_warned_roots = set()
+
+
+# Folders never worth searching for images (VCS, caches, system folders)
+_SKIP_DIRS = {'.git', '__pycache__', 'node_modules', 'System Volume Information', '$RECYCLE.BIN'}
+
+
+def _should_descend(entry: os.DirEntry) -> bool:
+    """Check whether a walker should descend into a directory entry.
+    
+    Hidden, system and symlinked folders are skipped (symlinks could loop).
+    """
+    name = entry.name
+    if name in _SKIP_DIRS or name.startswith('.'):
+        return False
+    return entry.is_dir(follow_symlinks=False)
+
+
+def _warn_depth_limit(root: str, max_depth: int):
+    """Report (once per root) that a search stopped descending because of the depth cap."""
+    if root in _depth_warned_roots:
+        return
+    _depth_warned_roots.add(root)
+    print(f"[SourceImagesUtils] Search depth limit ({max_depth}) reached under {root}, "
+          f"deeper folders are skipped. Check that this search directory is not too broad.")
+
+
+def _cache_get(cache: OrderedDict, key: tuple, now: float):
+    """Get a fresh entry from an LRU cache, dropping it if expired. Returns (hit, value)."""
+    with _cache_lock:
+        cached = cache.get(key)
+        if cached is None:
+            return False, None
+        if now - cached[1] >= _CACHE_TTL:
+            del cache[key]
+            return False, None
+        cache.move_to_end(key)
+        return True, cached[0]
+
+
+def _cache_put(cache: OrderedDict, key: tuple, value, now: float, max_size: int):
+    """Store an entry in an LRU cache, evicting the least recently used ones."""
+    with _cache_lock:
+        cache[key] = (value, now)
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+# Callable returning the default search dirs, registered by the Source Images plugin
+_default_search_dirs_provider = None
+
+
+def set_default_search_dirs_provider(provider):
+    """
+    Register a callable returning the directories to search when callers
+    don't pass search_dirs (the plugin registers its configured output dirs).
+    """
+    global _default_search_dirs_provider
+    _default_search_dirs_provider = provider
+
+
+def _default_search_dirs() -> List[str]:
+    """Get the configured output dirs, or the default 'outputs' folder."""
+    if _default_search_dirs_provider is not None:
+        try:
+            dirs = _default_search_dirs_provider()
+            if dirs:
+                return list(dirs)
+        except Exception as e:
+            print(f"[SourceImagesUtils] Error getting configured search dirs: {e}")
+    
+    # Get the root directory (where wgp.py is)
+    plugin_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(os.path.dirname(plugin_dir))
+    return [os.path.join(root_dir, 'outputs')]
+
+
+def is_temp_path(path: str) -> bool:
+    """
+    Check whether a path points into Gradio's temp upload folder.
+    
+    Args:
+        path: File path to check
+    
+    Returns:
+        True for browser uploads saved by Gradio, False for real paths
+    """
+    return _TEMP_RE.search(path) is not None
+
+
+def clear_find_cache():
+    """Clear cached find_file_by_name results (call when search dirs change)."""
+    with _cache_lock:
+        _find_cache.clear()
+        _index_cache.clear()
+
+
+def _spans_devices(dirs: List[str]) -> bool:
+    """Check whether the directories live on more than one device/mount."""
+    devices = set()
+    for d in dirs:
+        try:
+            devices.add(os.stat(d).st_dev)
+        except OSError:
+            continue
+    return len(devices) > 1
+
+
+def _use_parallel(dirs: List[str], parallel: Optional[bool]) -> bool:
+    """Decide whether to search several directories in parallel (None = auto)."""
+    if len(dirs) < 2:
+        return False
+    if parallel is None:
+        return _spans_devices(dirs)
+    return parallel
+
+
+def _pick_newer(known: Tuple[str, Optional[float]],
+                candidate: Tuple[str, Optional[float]]) -> Tuple[str, Optional[float]]:
+    """
+    Pick the most recently modified of two (path, mtime) entries.
+    
+    mtime may be None (not stat'ed yet); it is only looked up here, when two
+    files share a name, so unique filenames never cost a stat.
+    """
+    entries = []
+    for path, mtime in (known, candidate):
+        if mtime is None:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                mtime = float('-inf')
+        entries.append((path, mtime))
+    return entries[1] if entries[1][1] > entries[0][1] else entries[0]
+
+
+def _index_tree(root: str, max_depth: int = DEFAULT_MAX_DEPTH) -> Dict[str, Tuple[str, Optional[float]]]:
+    """Walk one directory tree and map each filename to its newest (path, mtime).
+    
+    mtime is None unless the name was seen more than once.
+    """
+    index = {}
+    stack = [(root, 0)]
+    depth_limited = False
+    
+    while stack:
+        current, depth = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        # d_type from the directory listing, no extra stat per entry
+                        if _should_descend(entry):
+                            if depth < max_depth:
+                                stack.append((entry.path, depth + 1))
+                            else:
+                                depth_limited = True
+                        elif entry.is_file():
+                            # Symlinked files count (only directory links are skipped)
+                            known = index.get(entry.name)
+                            if known is None:
+                                index[entry.name] = (entry.path, None)
+                            else:
+                                index[entry.name] = _pick_newer(known, (entry.path, None))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    
+    if depth_limited:
+        _warn_depth_limit(root, max_depth)
+    
+    return index
+
+
+def _build_filename_index(search_dirs: List[str], parallel: Optional[bool] = None,
+                          max_depth: int = DEFAULT_MAX_DEPTH) -> Dict[str, str]:
+    """
+    Walk all search directories once and map each filename to its path.
+    
+    If the same filename exists in several places, the most recently
+    modified file wins.
+    
+    Args:
+        search_dirs: List of directories to walk recursively
+        parallel: Walk directories in parallel threads. If None, only do so
+                  when they span several devices.
+        max_depth: Maximum folder depth to descend below each search dir
+    
+    Returns:
+        Dict mapping filename (basename) to full path
+    """
+    roots = [d for d in search_dirs or [] if os.path.isdir(d)]
+    
+    if _use_parallel(roots, parallel):
+        with ThreadPoolExecutor(max_workers=len(roots)) as executor:
+            trees = list(executor.map(lambda root: _index_tree(root, max_depth), roots))
+    else:
+        trees = [_index_tree(root, max_depth) for root in roots]
+    
+    merged = {}
+    for tree in trees:
+        for name, entry in tree.items():
+            known = merged.get(name)
+            merged[name] = entry if known is None else _pick_newer(known, entry)
+    
+    return {name: path for name, (path, _) in merged.items()}
+
+
+def get_filename_index(search_dirs: List[str], parallel: Optional[bool] = None,
+                       max_depth: int = DEFAULT_MAX_DEPTH) -> Dict[str, str]:
+    """
+    Get a filename -> path index for the search directories, reusing a
+    recently built one if available.
+    
+    Args:
+        search_dirs: List of directories to index
+        parallel: Walk directories in parallel threads. If None, only do so
+                  when they span several devices.
+        max_depth: Maximum folder depth to descend below each search dir
+    
+    Returns:
+        Dict mapping filename (basename) to full path
+    """
+    key = (tuple(search_dirs or ()), max_depth)
+    hit, index = _cache_get(_index_cache, key, time.monotonic())
+    if hit:
+        return index
+    
+    index = _build_filename_index(search_dirs, parallel, max_depth)
+    # Stamp after the walk so a slow walk isn't stored already expired
+    _cache_put(_index_cache, key, index, time.monotonic(), _INDEX_CACHE_MAX)
+    return index
+
+
+def _basename(path: str) -> str:
+    """Get the last path component with plain string splits (no normpath work)."""
+    if os.altsep:
+        path = path.rpartition(os.altsep)[2]
+    return path.rpartition(os.sep)[2]
+
+
+def _is_regular_file(path: str) -> bool:
+    """Check that a path is a regular file with a single stat call."""
+    try:
+        return stat.S_ISREG(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def _walk_find(root: str, filename: str, find_all: bool = False,
+               stop: Optional[threading.Event] = None, max_depth: int = DEFAULT_MAX_DEPTH) -> Optional[str]:
+    """
+    Walk a directory tree looking for a file by name.
+    
+    Args:
+        root: Directory to search recursively
+        filename: The filename to search for (basename only)
+        find_all: If True, visit the whole tree and return the most recently
+                  modified match instead of the first one found
+        stop: Optional event that aborts the walk when set (parallel search)
+        max_depth: Maximum folder depth to descend below root
+    
+    Returns:
+        Full path to the file if found, None otherwise
+    """
+    best_path = None
+    best_mtime = None
+    pending = deque([(root, 0)])
+    depth_limited = False
+    
+    while pending:
+        if stop is not None and stop.is_set():
+            return None
+        current, depth = pending.popleft()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        # Symlinked files count (only directory links are skipped)
+                        if entry.name == filename and entry.is_file():
+                            if not find_all:
+                                return entry.path
+                            mtime = entry.stat().st_mtime
+                            if best_mtime is None or mtime > best_mtime:
+                                best_path, best_mtime = entry.path, mtime
+                        elif _should_descend(entry):
+                            if depth < max_depth:
+                                pending.append((entry.path, depth + 1))
+                            else:
+                                depth_limited = True
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    
+    if depth_limited:
+        _warn_depth_limit(root, max_depth)
+    
+    return best_path
+
+
+def _parallel_walk_find(roots: List[str], filename: str, max_depth: int = DEFAULT_MAX_DEPTH) -> Optional[str]:
+    """Walk several directory trees in parallel and return the first match found."""
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(roots))
+    try:
+        pending = {executor.submit(_walk_find, root, filename, False, stop, max_depth) for root in roots}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found = future.result()
+                if found:
+                    return found
+        return None
+    finally:
+        # Tell the remaining walkers to stop instead of waiting for them
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def find_file_by_name(filename: str, search_dirs: List[str] = None, recursive: bool = True,
+                      find_all: bool = False, parallel: Optional[bool] = None,
+                      max_depth: int = DEFAULT_MAX_DEPTH) -> Optional[str]:
     """
     Search for a file by name in output directories.
     
@@ -25,8 +373,14 @@ def find_file_by_name(filename: str, search_dirs: List[str] = None, recursive: b
     Args:
         filename: The filename to search for (basename only)
         search_dirs: List of directories to search. 
-                     If None, falls back to default 'outputs' folder.
+                     If None, falls back to the plugin's configured output
+                     folders (or the default 'outputs' folder).
         recursive: Whether to search subdirectories
+        find_all: If True, return the most recently modified of all matches
+                  in a directory instead of stopping at the first one
+        parallel: Search directories in parallel threads. If None, only do so
+                  when they span several devices. Ignored with find_all.
+        max_depth: Maximum folder depth to descend below each search dir
     
     Returns:
         Full path to the file if found, None otherwise
@@ -34,31 +388,49 @@ def find_file_by_name(filename: str, search_dirs: List[str] = None, recursive: b
     if not filename:
         return None
     
-    # Get the root directory (where wgp.py is)
-    plugin_dir = os.path.dirname(os.path.abspath(__file__))
-    root_dir = os.path.dirname(os.path.dirname(plugin_dir))
-    
-    # Use provided search_dirs or fall back to default
+    # Use provided search_dirs or fall back to the configured ones
     if not search_dirs:
-        search_dirs = [os.path.join(root_dir, 'outputs')]
+        search_dirs = _default_search_dirs()
+    
+    # Return a cached result if it is still fresh
+    # parallel is part of the key: a parallel search returns the first match to finish,
+    # a serial one follows search_dirs order
+    key = (filename, tuple(search_dirs), recursive, find_all, parallel, max_depth)
+    hit, result = _cache_get(_find_cache, key, time.monotonic())
+    if hit:
+        return result
+    
+    result = _find_file_by_name_uncached(filename, search_dirs, recursive, find_all, parallel, max_depth)
+    # Stamp after the search so a slow walk isn't stored already expired
+    _cache_put(_find_cache, key, result, time.monotonic(), _FIND_CACHE_MAX)
+    return result
+
+
+def _find_file_by_name_uncached(filename: str, search_dirs: List[str], recursive: bool = True,
+                                find_all: bool = False, parallel: Optional[bool] = None,
+                                max_depth: int = DEFAULT_MAX_DEPTH) -> Optional[str]:
+    """Search for a file by name without consulting the cache."""
+    roots = [d for d in search_dirs if os.path.isdir(d)]
+    
+    if recursive and not find_all and _use_parallel(roots, parallel):
+        # Direct matches first, then walk all trees at once
+        for search_dir in roots:
+            direct_path = os.path.join(search_dir, filename)
+            if os.path.isfile(direct_path):
+                return direct_path
+        return _parallel_walk_find(roots, filename, max_depth)
     
     # Search each directory
-    for search_dir in search_dirs:
-        if not os.path.isdir(search_dir):
-            continue
-        
+    for search_dir in roots:
         # Direct match in directory
         direct_path = os.path.join(search_dir, filename)
         if os.path.isfile(direct_path):
             return direct_path
         
         if recursive:
-            # Recursive glob search
-            pattern = os.path.join(search_dir, '**', filename)
-            matches = glob.glob(pattern, recursive=True)
-            if matches:
-                # Return the most recently modified if multiple matches
-                return max(matches, key=os.path.getmtime)
+            found = _walk_find(search_dir, filename, find_all=find_all, max_depth=max_depth)
+            if found:
+                return found
     
     return None
 
@@ -69,13 +441,15 @@ def resolve_source_image(source_info: Union[str, Dict[str, Any]], search_dirs: L
     
     Handles both:
     - String paths (legacy format or direct paths)
-    - Dict with 'path', 'filename', 'is_temp' keys (new format)
+    - Dict with 'original_path' and/or 'path' (or 'temp_path'), 'filename',
+      'is_temp' keys (new format)
     
     For temp paths (browser uploads), searches outputs folder by filename.
     
     Args:
         source_info: Either a path string or a dict with path info
         search_dirs: Optional directories to search for the file
+                     (defaults to the configured output folders)
     
     Returns:
         Resolved file path if found, None otherwise
@@ -86,31 +460,37 @@ def resolve_source_image(source_info: Union[str, Dict[str, Any]], search_dirs: L
     # Handle string (path directly)
     if isinstance(source_info, str):
         # Check if it's a temp path
-        is_temp = 'gradio' in source_info.lower() and 'temp' in source_info.lower()
+        is_temp = is_temp_path(source_info)
         
-        if not is_temp and os.path.isfile(source_info):
+        if not is_temp and _is_regular_file(source_info):
             return source_info
         
         # Search by filename
-        filename = os.path.basename(source_info)
+        filename = _basename(source_info)
         found = find_file_by_name(filename, search_dirs)
         if found:
             return found
         
         # If still not found but temp file exists, return temp path
-        if os.path.isfile(source_info):
+        # (non-temp paths were already checked above)
+        if is_temp and _is_regular_file(source_info):
             return source_info
         
         return None
     
     # Handle dict format
     if isinstance(source_info, dict):
-        path = source_info.get('path')
+        # Fast path: original already resolved when the metadata was saved
+        original_path = source_info.get('original_path')
+        if original_path and _is_regular_file(original_path):
+            return original_path
+        
+        path = source_info.get('path') or source_info.get('temp_path')
         filename = source_info.get('filename')
         is_temp = source_info.get('is_temp', False)
         
         # If not temp and path exists, use it directly
-        if not is_temp and path and os.path.isfile(path):
+        if not is_temp and path and _is_regular_file(path):
             return path
         
         # Search by filename (works for temp files since filename is preserved)
@@ -120,7 +500,8 @@ def resolve_source_image(source_info: Union[str, Dict[str, Any]], search_dirs: L
                 return found
         
         # Last resort: return the original path if it exists (temp still valid)
-        if path and os.path.isfile(path):
+        # (non-temp paths were already checked above)
+        if is_temp and path and _is_regular_file(path):
             return path
     
     return None
@@ -133,6 +514,7 @@ def get_source_images_from_metadata(metadata: Dict[str, Any], search_dirs: List[
     Args:
         metadata: The metadata dict from a WanGP output file
         search_dirs: Optional directories to search for files
+                     (defaults to the configured output folders)
     
     Returns:
         Dict mapping image keys to resolved file paths
@@ -172,16 +554,22 @@ def load_source_image(source_info: Union[str, Dict[str, Any]], search_dirs: List
     Args:
         source_info: Either a path string or a dict with path info
         search_dirs: Optional directories to search for the file
+                     (defaults to the configured output folders)
     
     Returns:
         PIL Image if found and loaded, None otherwise
     """
-    from PIL import Image
+    global _PIL_Image
+    if _PIL_Image is None:
+        from PIL import Image as _PIL_Image
     
+    # resolve_source_image only returns existing files, Image.open reports the rest
     path = resolve_source_image(source_info, search_dirs)
-    if path and os.path.isfile(path):
+    if path:
         try:
-            return Image.open(path)
+            # Load fully and close the file instead of leaving it open for the caller
+            with _PIL_Image.open(path) as image:
+                return image.copy()
         except Exception as e:
             print(f"[SourceImagesUtils] Error loading image {path}: {e}")
     